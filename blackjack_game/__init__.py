@@ -1,115 +1,220 @@
-from typing import Dict, List, Tuple
+from typing import Callable, Dict, List, Optional
 import random
-from mcdreforged.api.all import *
+import sys
+from mcdreforged.api.command import Literal
+from mcdreforged.api.types import PluginServerInterface
 
-# 牌组定义 - 使用元组确保不可变
-CARDS = ('2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A')
-CARD_VALUES = {
-    '2': 2, '3': 3, '4': 4, '5': 5, '6': 6, '7': 7, '8': 8, '9': 9,
-    '10': 10, 'J': 10, 'Q': 10, 'K': 10, 'A': 11  # A默认为11，特殊处理
-}
+# 牌组定义 - 内部使用整数编码(0-12)，字符串仅用于显示
+CARD_NAMES = ('2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A')
+CARD_INTS = (2, 3, 4, 5, 6, 7, 8, 9, 10, 10, 10, 10, 11)  # A默认为11，特殊处理
+CARDS = range(len(CARD_NAMES))
+ACE = 12  # A的编码
+
+# 手牌累计状态打包为一个整数: 低16位为A按11计的累计点数，高位为A的数量
+ACE_SHIFT = 16
+TOTAL_MASK = (1 << ACE_SHIFT) - 1
+CARD_STATES = tuple(CARD_INTS[c] | ((c == ACE) << ACE_SHIFT) for c in CARDS)
+SHOE_SIZE = 64  # 每次预抽的牌数
+GAME_POOL_SIZE = 32  # 最多缓存的可复用游戏对象数
+
+# 插件独立的随机数生成器，预先绑定方法避免每次抽牌时查找属性
+_rng = random.Random()
+_choices = _rng.choices
+
+# 手牌结算结果编码
+OUTCOME_SURRENDER = 0  # 投降
+OUTCOME_BUST = 1  # 爆牌
+OUTCOME_FIVE_DRAGONS = 2  # 五小龙
+OUTCOME_BLACKJACK = 3  # Blackjack
+OUTCOME_COMPARE = 4  # 与庄家比点
+OUTCOME_PAYOUTS = (-1, -2, 2, 3)  # 按结算结果编码索引的赔率，以半分为单位（比点除外）
+
+# 帮助信息 - 模块加载时构建一次
+HELP_MSG = '''§6===== 21点小游戏 =====
+§e!!21 help§f - 显示帮助信息
+§e!!21 start§f - 开始新游戏
+§e!!21 stop§f - 结束游戏
+§e!!21 h§f - 要牌
+§e!!21 s§f - 停牌
+§e!!21 d§f - 双倍下注（Blackjack时禁用）
+§e!!21 p§f - 分牌
+§e!!21 sur§f - 投降
+
+§6===== 游戏规则 =====
+1. 目标: 点数接近21点但不超
+2. A可计为1点或11点
+3. 庄家规则: 点数≥17停牌
+4. Blackjack: 仅初始两张牌组成21点(1.5倍)，自动停牌
+5. 双倍下注: 奖励翻倍(Blackjack时禁用)
+6. 分牌: 相同点数可拆分(最多分4次)
+7. 五小龙: 5张牌未爆直接获胜
+8. 投降输一半
+§6=================='''.strip()
+
+# 手牌状态位
+F_STAND = 1  # 停牌
+F_BUSTED = 2  # 爆牌
+F_DOUBLED = 4  # 双倍下注
+F_SURRENDERED = 8  # 投降
+F_BLACKJACK = 16  # Blackjack
+F_ALL = F_STAND | F_BUSTED | F_DOUBLED | F_SURRENDERED | F_BLACKJACK
+
+# 手牌状态标记 - 按状态位预先生成，投降优先于爆牌，爆牌优先于停牌
+HAND_STATUS = tuple(
+    "§8(投降)" if flags & F_SURRENDERED else
+    "§c(爆牌)" if flags & F_BUSTED else
+    "§a(停牌)" if flags & F_STAND else ""
+    for flags in range(F_ALL + 1)
+)
+BLACKJACK_TAG = "§6(Blackjack!)"
+DOUBLED_TAG = "§6(双倍)"
+
+# Blackjack时禁止的命令
+BLACKJACK_LOCKED_COMMANDS = frozenset(('h', 'd', 'p', 'sur'))
+
+def hand_value(state: int) -> int:
+    """由打包的累计状态（A按11计的累计点数和A的数量）计算实际点数"""
+    hard_total = state & TOTAL_MASK
+    ace_count = state >> ACE_SHIFT
+    if hard_total > 21 and ace_count:
+        # 需要按1点计的A的数量: ceil((hard_total - 21) / 10)，不超过A的数量
+        hard_total -= min(ace_count, (hard_total - 12) // 10) * 10
+    return hard_total
+
+def _fmt_score(halves: int) -> str:
+    """格式化以半分为单位的分数 - 整数不显示小数位"""
+    return f"{halves / 2:.1f}" if halves & 1 else f"{halves // 2}"
 
 class PlayerHand:
-    __slots__ = ('cards', 'bet', 'stand', 'busted', 'doubled', 'surrendered', 'is_split')
+    __slots__ = ('cards', 'bet', 'flags', 'is_split', 'outcome', 'first_action_ok', '_state', '_value', '_repr')
+    
+    def __init__(self, cards: List[int], bet: int = 1, is_split: bool = False):
+        self.cards = bytearray()  # 牌列表 - 单字节连续存储
+        self.reset(bet, is_split)
+        
+        for card in cards:
+            self.add_card(card)
     
-    def __init__(self, cards: List[str], bet: float = 1.0, is_split: bool = False):
-        self.cards = cards  # 牌列表
+    def reset(self, bet: int = 1, is_split: bool = False):
+        """清空手牌并重置状态，保留底层存储以便复用"""
+        self.cards.clear()
         self.bet = bet  # 下注倍数
-        self.stand = False  # 是否停牌
-        self.busted = False  # 是否爆牌
-        self.doubled = False  # 是否双倍下注
-        self.surrendered = False  # 是否投降
+        self.flags = 0  # 状态位（停牌/爆牌/双倍下注/投降/Blackjack）
         self.is_split = is_split  # 是否来自分牌
+        self.outcome = OUTCOME_COMPARE  # 结算结果编码
+        self.first_action_ok = False  # 是否仍可进行首轮操作（分牌/投降）
+        self._state = 0  # 打包的累计状态，见CARD_STATES
+        self._value = 0  # 点数缓存
+        self._repr = ''  # 显示字符串缓存，手牌变化时失效
     
-    def add_card(self, card: str):
-        """添加一张牌并检查是否爆牌"""
-        self.cards.append(card)
-        self.check_bust()
-    
-    def check_bust(self):
-        """高效检查是否爆牌"""
-        total = 0
-        ace_count = 0
-        
-        # 快速计算点数
-        for card in self.cards:
-            if card == 'A':
-                ace_count += 1
-                total += 11
-            else:
-                total += CARD_VALUES[card]
-        
-        # 处理A的情况
-        while total > 21 and ace_count:
-            total -= 10
-            ace_count -= 1
-        
-        self.busted = total > 21
+    def add_card(self, card: int) -> int:
+        """添加一张牌，增量更新点数并检查是否爆牌，返回当前牌数"""
+        cards = self.cards
+        cards.append(card)
+        self._repr = ''
+        state = self._state = self._state + CARD_STATES[card]
+        
+        total = hand_value(state)
+        card_count = len(cards)
+        flags = self.flags & ~F_BLACKJACK
+        self._value = total
+        
+        # 更新状态位和结算结果编码，结算结果编码同时作为五小龙状态的缓存
+        if total > 21:
+            flags |= F_BUSTED
+            self.outcome = OUTCOME_BUST
+        elif card_count == 2 and not self.is_split and total == 21:
+            flags |= F_BLACKJACK
+            self.outcome = OUTCOME_BLACKJACK
+        elif card_count >= 5:
+            self.outcome = OUTCOME_FIVE_DRAGONS
+        else:
+            self.outcome = OUTCOME_COMPARE
+        self.flags = flags
+        return card_count
     
     def is_blackjack(self) -> bool:
-        """检查是否是21点 - 必须由两张牌组成且不是分牌后"""
-        return len(self.cards) == 2 and not self.is_split and self.calculate_value() == 21
+        """检查是否是21点 - 必须由两张牌组成且不是分牌后（使用缓存）"""
+        return bool(self.flags & F_BLACKJACK)
     
     def is_five_dragons(self) -> bool:
-        """检查是否是五小龙（五张牌未爆）"""
-        return len(self.cards) >= 5 and not self.busted
+        """检查是否是五小龙（五张牌未爆，使用缓存）"""
+        return self.outcome == OUTCOME_FIVE_DRAGONS
     
     def calculate_value(self) -> int:
-        """计算牌面点数（不检查爆牌）"""
-        total = 0
-        ace_count = 0
-        
-        for card in self.cards:
-            if card == 'A':
-                ace_count += 1
-                total += 11
-            else:
-                total += CARD_VALUES[card]
-        
-        while total > 21 and ace_count:
-            total -= 10
-            ace_count -= 1
-        
-        return total
+        """获取牌面点数（使用缓存）"""
+        return self._value
     
     def __str__(self) -> str:
-        return ' '.join(self.cards)
+        text = self._repr
+        if not text:
+            text = self._repr = ' '.join(CARD_NAMES[c] for c in self.cards)
+        return text
 
 class PlayerGame:
     """玩家游戏状态 - 使用__slots__减少内存占用"""
-    __slots__ = ('player', 'hands', 'dealer_hand', 'current_hand_index', 'score', 'in_game', 
-                 'dealer_value', 'dealer_busted')
+    __slots__ = ('player', 'hands', 'dealer_hand', 'current_hand_index', 'score_halves', 'in_game', 
+                 'dealer_value', 'dealer_busted', '_dealer_state', '_shoe')
     
     def __init__(self, player: str):
         self.player = player  # 玩家名称
         self.hands: List[PlayerHand] = []  # 玩家多手牌
-        self.dealer_hand: List[str] = []  # 庄家手牌
+        self.dealer_hand = bytearray()  # 庄家手牌 - 单字节连续存储
         self.current_hand_index = 0  # 当前操作的手牌索引
-        self.score = 0.0  # 玩家当前分数
+        self.score_halves = 0  # 玩家当前分数（半分为单位，避免浮点运算）
         self.in_game = False  # 是否在游戏中
         self.dealer_value = 0  # 庄家点数缓存
         self.dealer_busted = False  # 庄家是否爆牌缓存
+        self._dealer_state = 0  # 庄家打包的累计状态，见CARD_STATES
+        self._shoe: List[int] = []  # 预抽的牌，跨局使用，用完再补充
+    
+    def reset(self, player: str):
+        """重置为新玩家的初始状态，用于复用对象（保留预抽的牌和手牌对象）"""
+        self.player = player
+        self.current_hand_index = 0
+        self.score_halves = 0
+        self.in_game = False
+    
+    @property
+    def score(self) -> float:
+        """玩家当前分数"""
+        return self.score_halves / 2
     
     def start_new_round(self):
         """开始新一局游戏"""
-        self.hands = [PlayerHand([])]
-        self.dealer_hand = []
+        # 复用上一局的手牌对象和存储，只保留第一手牌
+        hands = self.hands
+        if hands:
+            del hands[1:]
+            hand = hands[0]
+            hand.reset()
+        else:
+            hand = PlayerHand([])
+            hands.append(hand)
+        self.dealer_hand.clear()
+        self._dealer_state = 0
         self.current_hand_index = 0
         
         # 发牌：玩家2张，庄家2张（1张暗牌）
         for _ in range(2):
-            self.hands[0].add_card(self.draw_card())
-            self.dealer_hand.append(self.draw_card())
+            hand.add_card(self.draw_card())
+            self.add_dealer_card(self.draw_card())
         
-        # 检查是否为Blackjack（自动停牌）
-        if self.hands[0].is_blackjack():
-            self.hands[0].stand = True
+        # 检查是否为Blackjack（自动停牌），否则允许首轮操作
+        if hand.is_blackjack():
+            hand.flags |= F_STAND
+        else:
+            hand.first_action_ok = True
         
         self.in_game = True
     
-    def draw_card(self) -> str:
-        """随机抽取一张牌 - 高效实现"""
-        return random.choice(CARDS)
+    def draw_card(self) -> int:
+        """从预抽的牌中取一张牌 - 高效实现"""
+        shoe = self._shoe
+        if not shoe:
+            # 预抽的牌用完时一次性补充
+            shoe = self._shoe = _choices(CARDS, k=SHOE_SIZE)
+        return shoe.pop()
     
     def get_current_hand(self) -> PlayerHand:
         """获取当前操作的手牌"""
@@ -123,43 +228,41 @@ class PlayerGame:
     def hit(self):
         """玩家要牌"""
         hand = self.get_current_hand()
-        if not hand.stand and not hand.busted and not hand.surrendered:
-            hand.add_card(self.draw_card())
+        if not hand.flags & (F_STAND | F_BUSTED | F_SURRENDERED):
+            hand.first_action_ok = False
+            card_count = hand.add_card(self.draw_card())
             
             # 五张牌未爆牌自动停牌（五小龙）
-            if len(hand.cards) >= 5 and not hand.busted:
-                hand.stand = True
+            if card_count >= 5 and not hand.flags & F_BUSTED:
+                hand.flags |= F_STAND
     
     def stand(self):
         """玩家停牌"""
         hand = self.get_current_hand()
-        if not hand.busted and not hand.surrendered:
-            hand.stand = True
+        if not hand.flags & (F_BUSTED | F_SURRENDERED):
+            hand.flags |= F_STAND
+            hand.first_action_ok = False
     
     def double_down(self) -> bool:
         """双倍下注 - 高效实现（禁止Blackjack时使用）"""
         hand = self.get_current_hand()
-        # 检查是否可以双倍下注：不能是Blackjack
-        if (not hand.stand and 
-            not hand.busted and 
-            not hand.surrendered and 
-            not hand.doubled and
-            not hand.is_blackjack()):  # 禁止Blackjack时双倍下注
-            
+        # 检查是否可以双倍下注：未停牌/爆牌/投降/双倍下注，且不能是Blackjack
+        if not hand.flags & F_ALL:
             hand.bet *= 2
-            hand.doubled = True
+            hand.flags |= F_DOUBLED
+            hand.first_action_ok = False
             hand.add_card(self.draw_card())
-            hand.stand = True
+            hand.flags |= F_STAND
             return True
         return False
     
     def split(self) -> bool:
         """分牌 - 高效实现"""
         hand = self.get_current_hand()
-        # 检查是否可以分牌：两张相同点数的牌，且手牌数量少于4（最多分4次）
-        if (len(hand.cards) == 2 and 
+        # 检查是否可以分牌：首轮操作的两张相同点数的牌，且手牌数量少于4（最多分4次）
+        if (hand.first_action_ok and 
             len(self.hands) < 4 and 
-            CARD_VALUES[hand.cards[0]] == CARD_VALUES[hand.cards[1]]):
+            CARD_INTS[hand.cards[0]] == CARD_INTS[hand.cards[1]]):
             
             # 创建新手牌
             card1, card2 = hand.cards
@@ -169,6 +272,8 @@ class PlayerGame:
             # 添加新牌
             new_hand1.add_card(self.draw_card())
             new_hand2.add_card(self.draw_card())
+            new_hand1.first_action_ok = True
+            new_hand2.first_action_ok = True
             
             # 替换当前手牌
             self.hands[self.current_hand_index] = new_hand1
@@ -179,79 +284,72 @@ class PlayerGame:
     def surrender(self) -> bool:
         """投降 - 高效实现"""
         hand = self.get_current_hand()
-        if len(hand.cards) == 2 and not hand.stand and not hand.busted:
-            hand.surrendered = True
-            hand.stand = True
+        if hand.first_action_ok:
+            hand.flags |= F_SURRENDERED | F_STAND
+            hand.first_action_ok = False
+            hand.outcome = OUTCOME_SURRENDER
             return True
         return False
     
     def dealer_play(self):
         """庄家行动 - 高效实现"""
-        # 预计算庄家点数
-        self.calculate_dealer_value()
-        
-        # 庄家规则：大于等于17点停牌，否则要牌
-        while not self.dealer_busted and self.dealer_value < 17:
-            self.dealer_hand.append(self.draw_card())
-            self.calculate_dealer_value()
-    
-    def calculate_dealer_value(self):
-        """计算庄家点数和是否爆牌 - 结果缓存"""
-        total = 0
-        ace_count = 0
-        
-        for card in self.dealer_hand:
-            if card == 'A':
-                ace_count += 1
-                total += 11
-            else:
-                total += CARD_VALUES[card]
-        
-        while total > 21 and ace_count:
-            total -= 10
-            ace_count -= 1
+        # 循环内只操作局部变量，结束后一次性写回缓存
+        dealer_hand = self.dealer_hand
+        draw_card = self.draw_card
+        state = self._dealer_state
+        total = self.dealer_value
+        
+        # 庄家规则：大于等于17点停牌，否则要牌（点数小于17时不会爆牌）
+        while total < 17:
+            card = draw_card()
+            dealer_hand.append(card)
+            state += CARD_STATES[card]
+            total = hand_value(state)
+        
+        self._dealer_state = state
+        self.dealer_value = total
+        self.dealer_busted = total > 21
+    
+    def add_dealer_card(self, card: int):
+        """庄家添加一张牌，增量更新点数并检查是否爆牌 - 结果缓存"""
+        self.dealer_hand.append(card)
+        state = self._dealer_state = self._dealer_state + CARD_STATES[card]
         
+        total = hand_value(state)
         self.dealer_value = total
         self.dealer_busted = total > 21
     
     def settle_round(self):
-        """结算当前游戏 - 高效实现"""
+        """结算当前游戏，返回本局得分（半分为单位） - 高效实现"""
+        # 庄家爆牌时按0点比较，未爆牌的手牌必然获胜
+        dealer_value = 0 if self.dealer_busted else self.dealer_value
+        
+        # 未分牌的单手牌占绝大多数，直接结算，省去循环
+        if len(self.hands) == 1:
+            hand = self.hands[0]
+            outcome = hand.outcome
+            if outcome == OUTCOME_COMPARE:
+                value = hand._value
+                round_score = hand.bet * 2 * ((value > dealer_value) - (value < dealer_value))
+            else:
+                round_score = hand.bet * OUTCOME_PAYOUTS[outcome]
+            self.score_halves += round_score
+            self.in_game = False
+            return round_score
+        
         round_score = 0
         
-        # 结算每手牌
+        # 结算每手牌：投降/爆牌/五小龙/Blackjack直接查赔率表，其余与庄家比点
         for hand in self.hands:
-            if hand.surrendered:
-                round_score -= hand.bet * 0.5  # 投降损失一半下注
-                continue
-            
-            if hand.busted:
-                round_score -= hand.bet  # 爆牌损失全部下注
-                continue
-            
-            # 五小龙规则（五张牌未爆）且不是Blackjack
-            if hand.is_five_dragons() and not hand.is_blackjack():
-                round_score += hand.bet
-                continue
-            
-            # Blackjack规则（只能由两张牌组成）
-            if hand.is_blackjack():
-                round_score += hand.bet * 1.5
-                continue
-            
-            # 庄家爆牌，玩家获胜
-            if self.dealer_busted:
-                round_score += hand.bet
-                continue
-            
-            # 普通比较
-            hand_value = hand.calculate_value()
-            if hand_value > self.dealer_value:
-                round_score += hand.bet
-            elif hand_value < self.dealer_value:
-                round_score -= hand.bet
+            outcome = hand.outcome
+            if outcome == OUTCOME_COMPARE:
+                value = hand.calculate_value()
+                round_score += hand.bet * 2 * ((value > dealer_value) - (value < dealer_value))
+            else:
+                round_score += hand.bet * OUTCOME_PAYOUTS[outcome]
         
         # 更新玩家总分数
-        self.score += round_score
+        self.score_halves += round_score
         self.in_game = False
         return round_score
 
@@ -260,32 +358,39 @@ class BlackjackGame:
     def __init__(self, server: PluginServerInterface):
         self.server = server
         self.player_games: Dict[str, PlayerGame] = {}
-        
-        # 预定义帮助信息 - 避免重复创建
-        self.help_msg = '''§6===== 21点小游戏 =====
-§e!!21 help§f - 显示帮助信息
-§e!!21 start§f - 开始新游戏
-§e!!21 stop§f - 结束游戏
-§e!!21 h§f - 要牌
-§e!!21 s§f - 停牌
-§e!!21 d§f - 双倍下注（Blackjack时禁用）
-§e!!21 p§f - 分牌
-§e!!21 sur§f - 投降
-
-§6===== 游戏规则 =====
-1. 目标: 点数接近21点但不超
-2. A可计为1点或11点
-3. 庄家规则: 点数≥17停牌
-4. Blackjack: 仅初始两张牌组成21点(1.5倍)，自动停牌
-5. 双倍下注: 奖励翻倍(Blackjack时禁用)
-6. 分牌: 相同点数可拆分(最多分4次)
-7. 五小龙: 5张牌未爆直接获胜
-8. 投降输一半
-§6=================='''.strip()
+        self._free_games: List[PlayerGame] = []  # 可复用的游戏对象池
+        
+        # 命令分发表 - 避免逐个比较命令字符串
+        self._handlers: Dict[str, Callable[[str, PlayerGame, PlayerHand], None]] = {
+            'h': self._cmd_hit,  # 要牌
+            's': self._cmd_stand,  # 停牌
+            'd': self._cmd_double,  # 双倍下注
+            'p': self._cmd_split,  # 分牌
+            'sur': self._cmd_surrender,  # 投降
+        }
+        
+        self.help_msg = HELP_MSG
 
     def get_player_game(self, player: str) -> PlayerGame:
         """获取玩家游戏状态，不存在则创建"""
-        return self.player_games.setdefault(player, PlayerGame(player))
+        game = self.player_games.get(player)
+        if game is None:
+            # 首次创建时驻留玩家名，后续查找可走指针比较
+            player = sys.intern(player)
+            if self._free_games:
+                game = self._free_games.pop()
+                game.reset(player)
+            else:
+                game = PlayerGame(player)
+            self.player_games[player] = game
+        return game
+    
+    def remove_player_game(self, player: str) -> Optional[PlayerGame]:
+        """移除玩家游戏状态并回收对象，返回被移除的游戏"""
+        game = self.player_games.pop(player, None)
+        if game is not None and len(self._free_games) < GAME_POOL_SIZE:
+            self._free_games.append(game)
+        return game
     
     def start_game(self, player: str):
         """开始游戏"""
@@ -294,196 +399,215 @@ class BlackjackGame:
             self.server.tell(player, "§c你已经在游戏中! 使用 !!21 stop 结束游戏")
             return
         
+        # 如果是Blackjack，自动进入下一动作
+        if self._deal_round(player, game):
+            self.next_action(player)
+    
+    def _deal_round(self, player: str, game: PlayerGame, notice: str = '') -> bool:
+        """开始新一局并发送状态，notice非空时合并为一条消息发送，返回是否为Blackjack"""
         game.start_new_round()
-        self.display_game_state(player)
+        message = self.format_game_state(game)
+        if notice:
+            message = f"{notice}\n{message}"
         
-        # 如果是Blackjack，自动进入下一动作
         if game.get_current_hand().is_blackjack():
-            self.server.tell(player, "§aBlackjack! 自动停牌")
-            self.next_action(player)
+            self.server.tell(player, f"{message}\n§aBlackjack! 自动停牌")
+            return True
+        self.server.tell(player, message)
+        return False
     
     def stop_game(self, player: str):
         """结束游戏 - 高效实现"""
-        if player in self.player_games:
-            game = self.player_games.pop(player)
+        game = self.remove_player_game(player)
+        if game is not None:
             self.server.tell(player, f"§a游戏结束! 最终得分: §e{game.score:.1f}")
         else:
             self.server.tell(player, "§a你当前没有进行中的游戏")
     
     def display_game_state(self, player: str):
-        """显示当前游戏状态 - 高效实现"""
-        game = self.get_player_game(player)
-        
+        """显示当前游戏状态"""
+        self.server.tell(player, self.format_game_state(self.get_player_game(player)))
+    
+    def format_game_state(self, game: PlayerGame) -> str:
+        """构建当前游戏状态消息 - 高效实现"""
         # 显示庄家手牌
-        dealer_display = f"{game.dealer_hand[0]} ?" if len(game.dealer_hand) > 1 else ' '.join(game.dealer_hand)
+        dealer_display = f"{CARD_NAMES[game.dealer_hand[0]]} ?" if len(game.dealer_hand) > 1 else ' '.join(CARD_NAMES[c] for c in game.dealer_hand)
+        
+        score_text = f"§6得分: §e{_fmt_score(game.score_halves)}"
+        
+        # 未分牌时只有一手牌，直接拼接
+        hands = game.hands
+        if len(hands) == 1 and game.current_hand_index == 0:
+            hand = hands[0]
+            flags = hand.flags
+            blackjack_info = BLACKJACK_TAG if flags & F_BLACKJACK else ""
+            bet_info = DOUBLED_TAG if flags & F_DOUBLED else ""
+            return f"{score_text}\n§e你的牌:§f {hand} {HAND_STATUS[flags]} {blackjack_info} {bet_info}\n§6庄家: {dealer_display}"
         
         # 显示玩家所有手牌
         hands_info = []
         current_index = game.current_hand_index
         
         for i, hand in enumerate(game.hands):
-            status = ""
-            if hand.surrendered:
-                status = "§8(投降)"
-            elif hand.busted:
-                status = "§c(爆牌)"
-            elif hand.stand:
-                status = "§a(停牌)"
+            flags = hand.flags
+            status = HAND_STATUS[flags]
             
             prefix = f"手牌{i+1}:" if len(game.hands) > 1 else "你的牌:"
             if i == current_index:
                 prefix = f"§e{prefix}§f"
             
             # 显示Blackjack状态
-            blackjack_info = "§6(Blackjack!)" if hand.is_blackjack() else ""
-            bet_info = "§6(双倍)" if hand.doubled else ""
+            blackjack_info = BLACKJACK_TAG if flags & F_BLACKJACK else ""
+            bet_info = DOUBLED_TAG if flags & F_DOUBLED else ""
             
             hands_info.append(f"{prefix} {hand} {status} {blackjack_info} {bet_info}")
         
         # 组合消息
-        score_text = f"§6得分: §e{game.score:.1f}" if game.score % 1 > 0 else f"§6得分: §e{int(game.score)}"
-        self.server.tell(player, f"{score_text}\n{' '.join(hands_info)}\n§6庄家: {dealer_display}")
+        return f"{score_text}\n{' '.join(hands_info)}\n§6庄家: {dealer_display}"
     
     def process_command(self, player: str, command: str):
         """处理玩家命令 - 高效实现"""
-        game = self.get_player_game(player)
+        # 只查找不创建，避免未开始游戏的玩家留下空的游戏状态
+        game = self.player_games.get(player)
         
-        if not game.in_game:
+        if game is None or not game.in_game:
             self.server.tell(player, "§a你当前没有进行中的游戏, 使用§e!!21 start§a开始游戏")
             return
         
-        command = command.lower()
+        # 命令来自固定的Literal节点，无需再转换大小写
+        handler = self._handlers.get(command)
+        if handler is None:
+            self.server.tell(player, f"§c未知命令: {command}, 使用§e!!21 help§c查看帮助")
+            return
         
-        try:
-            hand = game.get_current_hand()
-            
-            if command == 'h':  # 要牌
-                # 检查是否是Blackjack
-                if hand.is_blackjack():
-                    self.server.tell(player, "§cBlackjack时不能要牌! 已自动停牌")
-                    return
-                
-                game.hit()
-                hand = game.get_current_hand()
-                if hand.busted or hand.stand:
-                    self.next_action(player)
-                else:
-                    self.display_game_state(player)
-            
-            elif command == 's':  # 停牌
-                game.stand()
-                self.next_action(player)
-            
-            elif command == 'd':  # 双倍下注
-                # 检查是否是Blackjack
-                if hand.is_blackjack():
-                    self.server.tell(player, "§cBlackjack时不能双倍下注! 已自动停牌")
-                    return
-                
-                if game.double_down():
-                    self.next_action(player)
-                else:
-                    self.server.tell(player, "§c无法双倍下注, 该手牌已停牌/爆牌/投降或已双倍下注")
-            
-            elif command == 'p':  # 分牌
-                # 检查是否是Blackjack
-                if hand.is_blackjack():
-                    self.server.tell(player, "§cBlackjack时不能分牌! 已自动停牌")
-                    return
-                
-                if game.split():
-                    self.display_game_state(player)
-                else:
-                    self.server.tell(player, "§c无法分牌, 只能分相同点数的牌")
-            
-            elif command == 'sur':  # 投降
-                # 检查是否是Blackjack
-                if hand.is_blackjack():
-                    self.server.tell(player, "§cBlackjack时不能投降! 已自动停牌")
-                    return
-                
-                if game.surrender():
-                    self.next_action(player)
-                else:
-                    self.server.tell(player, "§c无法投降, 只能在第一轮使用")
-            
-            else:
-                self.server.tell(player, f"§c未知命令: {command}, 使用§e!!21 help§c查看帮助")
+        hand = game.get_current_hand()
         
-        except Exception as e:
-            self.server.logger.error(f"处理21点命令时出错: {e}")
-            self.server.tell(player, "§c命令执行出错, 请重试")
+        # Blackjack已自动停牌，除停牌外的操作统一拦截
+        if command in BLACKJACK_LOCKED_COMMANDS and hand.is_blackjack():
+            self.server.tell(player, "§cBlackjack时不能操作! 已自动停牌")
+            return
+        
+        handler(player, game, hand)
+    
+    def _cmd_hit(self, player: str, game: PlayerGame, hand: PlayerHand):
+        """要牌"""
+        game.hit()
+        if hand.flags & (F_BUSTED | F_STAND):
+            self.next_action(player)
+        else:
+            self.display_game_state(player)
+    
+    def _cmd_stand(self, player: str, game: PlayerGame, hand: PlayerHand):
+        """停牌"""
+        game.stand()
+        self.next_action(player)
+    
+    def _cmd_double(self, player: str, game: PlayerGame, hand: PlayerHand):
+        """双倍下注"""
+        if game.double_down():
+            self.next_action(player)
+        else:
+            self.server.tell(player, "§c无法双倍下注, 该手牌已停牌/爆牌/投降或已双倍下注")
+    
+    def _cmd_split(self, player: str, game: PlayerGame, hand: PlayerHand):
+        """分牌"""
+        if game.split():
+            self.display_game_state(player)
+        else:
+            self.server.tell(player, "§c无法分牌, 只能分相同点数的牌")
+    
+    def _cmd_surrender(self, player: str, game: PlayerGame, hand: PlayerHand):
+        """投降"""
+        if game.surrender():
+            self.next_action(player)
+        else:
+            self.server.tell(player, "§c无法投降, 只能在第一轮使用")
     
     def next_action(self, player: str):
-        """处理下一步动作 - 高效实现"""
+        """处理下一步动作，直到需要玩家操作为止 - 高效实现"""
         game = self.get_player_game(player)
         
-        # 检查是否还有未操作的手牌
-        if game.next_hand():
-            self.display_game_state(player)
-            return
+        # 所有手牌操作完成则结算并自动开始下一局；新一局为Blackjack时继续循环，避免递归
+        while not game.next_hand():
+            if not self._deal_round(player, game, self._finish_round(game)):
+                return
         
-        # 所有手牌操作完成，庄家行动
+        # 还有未操作的手牌
+        self.display_game_state(player)
+    
+    def _finish_round(self, game: PlayerGame) -> str:
+        """庄家行动并结算本局，返回结算消息"""
+        # 庄家行动
         game.dealer_play()
         
         # 结算游戏
         round_score = game.settle_round()
         score_sign = '+' if round_score >= 0 else ''
-        round_score_display = f"{score_sign}{round_score:.1f}" if round_score % 1 > 0 else f"{score_sign}{int(round_score)}"
-        
-        # 显示最终结果
-        dealer_cards = ' '.join(game.dealer_hand)
+        round_score_display = f"{score_sign}{_fmt_score(round_score)}"
         
-        # 预构建消息
-        message = [f"§6===== 本局结束 =====", f"§a你的牌:"]
+        # 显示最终结果（庄家点数已在dealer_play中缓存）
+        dealer_cards = ' '.join(CARD_NAMES[c] for c in game.dealer_hand)
         
-        for i, hand in enumerate(game.hands):
-            if hand.surrendered:
+        hands = game.hands
+        multi_hand = len(hands) > 1
+        hand_lines = []
+        for i, hand in enumerate(hands):
+            flags = hand.flags
+            if flags & F_SURRENDERED:
                 status = "§8(投降)"
-            elif hand.busted:
+            elif flags & F_BUSTED:
                 status = "§c(爆牌)"
             else:
                 status = f"§a({hand.calculate_value()}点)"
                 
-            prefix = f"手牌{i+1}:" if len(game.hands) > 1 else ""
-            blackjack_info = "§6(Blackjack!)" if hand.is_blackjack() else ""
-            bet_info = "§6(双倍)" if hand.doubled else ""
-            message.append(f"§f{prefix}{hand} {status} {blackjack_info} {bet_info}")
-        
-        message.extend([
-            f"§6庄家: {dealer_cards} ({game.dealer_value}点)",
-            f"§6本局得分: §e{round_score_display}",
-            f"§6总得分: §e{game.score:.1f}" if game.score % 1 > 0 else f"§6总得分: §e{int(game.score)}",
-            f"§6=================="
-        ])
-        
-        self.server.tell(player, "\n".join(message))
-        
-        # 自动开始下一局
-        self.server.tell(player, "§a自动开始下一局...")
-        self.start_game(player)
+            prefix = f"手牌{i+1}:" if multi_hand else ""
+            blackjack_info = BLACKJACK_TAG if flags & F_BLACKJACK else ""
+            bet_info = DOUBLED_TAG if flags & F_DOUBLED else ""
+            hand_lines.append(f"§f{prefix}{hand} {status} {blackjack_info} {bet_info}")
+        
+        # 使用单个模板构建消息，与下一局的状态合并发送
+        hand_text = "\n".join(hand_lines)
+        return (
+            f"§6===== 本局结束 =====\n§a你的牌:\n{hand_text}\n"
+            f"§6庄家: {dealer_cards} ({game.dealer_value}点)\n"
+            f"§6本局得分: §e{round_score_display}\n"
+            f"§6总得分: §e{_fmt_score(game.score_halves)}\n"
+            f"§6==================\n"
+            f"§a自动开始下一局..."
+        )
 
 def on_load(server: PluginServerInterface, old):
     """插件加载时执行"""
     game = BlackjackGame(server)
     
+    # 预先绑定方法，避免每次执行命令时重复查找属性
+    proc = game.process_command
+    start = game.start_game
+    stop = game.stop_game
+    help_msg = game.help_msg
+    
     # 注册命令
     server.register_command(
         Literal("!!21")
-        .then(Literal("help").runs(lambda src: src.reply(game.help_msg)))
-        .then(Literal("start").runs(lambda src: game.start_game(src.player)))
-        .then(Literal("stop").runs(lambda src: game.stop_game(src.player)))
-        .then(Literal("h").runs(lambda src: game.process_command(src.player, 'h')))
-        .then(Literal("s").runs(lambda src: game.process_command(src.player, 's')))
-        .then(Literal("d").runs(lambda src: game.process_command(src.player, 'd')))
-        .then(Literal("p").runs(lambda src: game.process_command(src.player, 'p')))
-        .then(Literal("sur").runs(lambda src: game.process_command(src.player, 'sur')))
+        .then(Literal("help").runs(lambda src: src.reply(help_msg)))
+        .then(Literal("start").runs(lambda src: start(src.player)))
+        .then(Literal("stop").runs(lambda src: stop(src.player)))
+        .then(Literal("h").runs(lambda src: proc(src.player, 'h')))
+        .then(Literal("s").runs(lambda src: proc(src.player, 's')))
+        .then(Literal("d").runs(lambda src: proc(src.player, 'd')))
+        .then(Literal("p").runs(lambda src: proc(src.player, 'p')))
+        .then(Literal("sur").runs(lambda src: proc(src.player, 'sur')))
     )
     
     # 保存实例
     server.register_help_message('!!21', '21点纸牌游戏')
     server.game = game
 
+def on_player_left(server: PluginServerInterface, player: str):
+    """玩家离开时清理其游戏状态，避免长期运行时内存持续增长"""
+    if hasattr(server, 'game'):
+        server.game.remove_player_game(player)
+
 def on_unload(server: PluginServerInterface):
     """插件卸载时清理"""
     if hasattr(server, 'game'):